@@ -1,25 +1,31 @@
-from flask import Flask, request, jsonify
+from flask import Flask, request
 from flask_cors import CORS
 import os
 import json
 from datetime import datetime
 import logging
+import threading
+import time
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor, TimeoutError as FutureTimeoutError, as_completed
+import orjson
+from cachetools import TTLCache
+
+# Must come before the service modules, which log while they are imported
+import logging_config  # noqa: F401
 from config import initialize_services
+from settings import SETTINGS
 from util import (
-    get_all_todos, get_todo_by_id, create_todo, update_todo, delete_todo,
-    get_cached_todos, get_cached_todo,
+    stream_all_todos, get_todo_by_id, reserve_todo_ids,
+    get_cached_todos, get_cached_todo, push_request_log, pop_request_logs,
     check_postgres, check_redis, check_elasticmq, send_notification
 )
-from models import get_db, Todo
+from models import SessionScoped, Todo
+from sqlalchemy import delete
 
 # Initialize services before creating the Flask app
 initialize_services()
 
-# Configure logging
-logging.basicConfig(
-    level=logging.INFO,
-    format='%(asctime)s - %(name)s - %(levelname)s - [%(filename)s:%(lineno)d] - %(message)s'
-)
 logger = logging.getLogger(__name__)
 
 app = Flask(__name__)
@@ -28,43 +34,148 @@ CORS(app)
 # Enable debug mode
 app.debug = True
 
+# Request/response bodies are truncated to this many bytes before logging
+MAX_LOG_BYTES = SETTINGS.max_log_bytes
+
+# Probe endpoints, hit several times per second, are not logged at all
+UNLOGGED_PATHS = frozenset(('/health', '/_health'))
+
+# Request logs are buffered in Redis and written out in batches
+REQUEST_LOG_FLUSH_INTERVAL = 1.0
+REQUEST_LOG_BATCH_SIZE = 100
+
+def _log_body(data):
+    return data[:MAX_LOG_BYTES].decode('utf-8', errors='replace')
+
+def _emit_request_log(record):
+    try:
+        push_request_log(record)
+    except Exception:
+        # Redis is unavailable, fall back to logging inline
+        logger.info('%s', orjson.dumps(record).decode())
+
+def flush_request_logs():
+    """Periodically drain buffered request logs and write them in batches"""
+    while True:
+        time.sleep(REQUEST_LOG_FLUSH_INTERVAL)
+        try:
+            while True:
+                batch = pop_request_logs(REQUEST_LOG_BATCH_SIZE)
+                if not batch:
+                    break
+                logger.info('Request log batch (%d):\n%s',
+                            len(batch),
+                            b'\n'.join(batch).decode())
+                if len(batch) < REQUEST_LOG_BATCH_SIZE:
+                    break
+        except Exception as e:
+            logger.error(f"Error flushing request logs: {str(e)}")
+
+threading.Thread(target=flush_request_logs, name='reqlog-flusher', daemon=True).start()
+
 # Add request logging middleware
 @app.before_request
 def log_request_info():
-    logger.info('Request: %s %s - Headers: %s - Body: %s',
-                request.method,
-                request.url,
-                dict(request.headers),
-                request.get_data(as_text=True))
+    if request.path in UNLOGGED_PATHS or not logger.isEnabledFor(logging.INFO):
+        return
+    _emit_request_log({
+        'event': 'request',
+        'method': request.method,
+        'url': request.url,
+        'headers': dict(request.headers),
+        'body': _log_body(request.get_data(cache=True))
+    })
 
 @app.after_request
 def log_response_info(response):
-    logger.info('Response: %s %s - Status: %s - Headers: %s - Body: %s',
-                request.method,
-                request.url,
-                response.status,
-                dict(response.headers),
-                response.get_data(as_text=True))
+    if request.path in UNLOGGED_PATHS or not logger.isEnabledFor(logging.INFO):
+        return response
+    if response.direct_passthrough or response.is_streamed:
+        body = None
+    else:
+        body = _log_body(response.get_data())
+    _emit_request_log({
+        'event': 'response',
+        'method': request.method,
+        'url': request.url,
+        'status': response.status,
+        'headers': dict(response.headers),
+        'body': body
+    })
     return response
 
+# Todo ids handed out before the worker persists the todo. They come from the
+# todos id sequence, so ids issued by different processes never collide
+_todo_ids = deque()
+_todo_ids_lock = threading.Lock()
+
+def _next_id():
+    with _todo_ids_lock:
+        if not _todo_ids:
+            _todo_ids.extend(reserve_todo_ids())
+        return _todo_ids.popleft()
+
+def ojsonify(obj, status=200):
+    return app.response_class(orjson.dumps(obj), status=status, mimetype='application/json')
+
+# Backend checks run concurrently so /health costs the slowest check, not the sum
+HEALTH_CHECKS = {
+    'postgres': check_postgres,
+    'redis': check_redis,
+    'elasticmq': check_elasticmq
+}
+HEALTH_CHECK_TIMEOUT = 2
+_HEALTH_POOL = ThreadPoolExecutor(max_workers=len(HEALTH_CHECKS), thread_name_prefix='health')
+# Latest submitted future per check; only touched under _HEALTH_CACHE_LOCK
+_HEALTH_FUTURES = {}
+
+# Probes hit /health several times per second; reuse the last result briefly
+HEALTH_CACHE_TTL = 1.0
+_HEALTH_CACHE = TTLCache(maxsize=1, ttl=HEALTH_CACHE_TTL)
+_HEALTH_CACHE_LOCK = threading.Lock()
+
+@app.teardown_request
+def close_db(exc):
+    # Return the request's connection to the pool
+    SessionScoped.remove()
+
 @app.route('/_health', methods=['GET'])
 def health():
-    return jsonify({
+    return ojsonify({
         'status': 'ok',
-    }), 200
+    }, 200)
 
 @app.route('/health', methods=['GET'])
 def health_check():
-    postgres_status = check_postgres()
-    redis_status = check_redis()
-    elasticmq_status = check_elasticmq()
+    # Single-flight: concurrent probes within the TTL share one set of backend checks
+    with _HEALTH_CACHE_LOCK:
+        cached = _HEALTH_CACHE.get('health')
+        if cached is None:
+            cached = _HEALTH_CACHE['health'] = _run_health_checks()
+    status, code = cached
+    return ojsonify(status, code)
+
+def _run_health_checks():
+    futures = {}
+    for name, check in HEALTH_CHECKS.items():
+        # A check still running past an earlier timeout is waited on again
+        # instead of resubmitted, so each check holds at most one pool thread
+        future = _HEALTH_FUTURES.get(name)
+        if future is None or future.done():
+            future = _HEALTH_FUTURES[name] = _HEALTH_POOL.submit(check)
+        futures[future] = name
+    results = {}
+    try:
+        for future in as_completed(futures, timeout=HEALTH_CHECK_TIMEOUT):
+            results[futures[future]] = future.result()
+    except FutureTimeoutError:
+        logger.error(f"Health checks timed out after {HEALTH_CHECK_TIMEOUT}s")
 
     status = {
         'timestamp': datetime.utcnow().isoformat(),
         'services': {
-            'postgres': postgres_status,
-            'redis': redis_status,
-            'elasticmq': elasticmq_status
+            name: results.get(name, {'status': 'unhealthy', 'error': 'Health check timed out'})
+            for name in HEALTH_CHECKS
         }
     }
 
@@ -73,7 +184,7 @@ def health_check():
         for service in status['services'].values()
     )
 
-    return jsonify(status), 200 if is_healthy else 503
+    return status, 200 if is_healthy else 503
 
 @app.route('/todos', methods=['GET'])
 def get_todos():
@@ -82,32 +193,32 @@ def get_todos():
         cached_data = get_cached_todos()
         if cached_data:
             logger.info("Returning todos from cache")
-            return jsonify(cached_data['todos']), 200
+            return app.response_class(cached_data, status=200, mimetype='application/json')
 
         # If not in cache, get from database
-        db = next(get_db())
-        todos = get_all_todos(db)
+        db = SessionScoped()
+        rows = [dict(row) for row in stream_all_todos(db)]
 
-        logger.info("Returning todos from database")
-        return jsonify([todo.to_dict() for todo in todos]), 200
+        logger.info(f"Returning {len(rows)} todos from database")
+        return ojsonify(rows, 200)
     except Exception as e:
         logger.error(f"Error fetching todos: {str(e)}")
-        return jsonify({'error': 'Internal server error'}), 500
+        return ojsonify({'error': 'Internal server error'}, 500)
 
 @app.route('/todos', methods=['POST'])
 def create_todo_route():
     try:
         data = request.get_json()
-        temp_id = int(datetime.utcnow().timestamp())
+        temp_id = _next_id()
         send_notification(temp_id, 'todo_created', data)
 
-        return jsonify({
+        return ojsonify({
             'message': 'Todo creation has been queued',
             'todo_id': temp_id
-        }), 202
+        }, 202)
     except Exception as e:
         logger.error(f"Error creating todo: {str(e)}")
-        return jsonify({'error': 'Internal server error'}), 500
+        return ojsonify({'error': 'Internal server error'}, 500)
 
 @app.route('/todos/<int:todo_id>', methods=['GET'])
 def get_todo(todo_id):
@@ -120,11 +231,11 @@ def get_todo(todo_id):
             logger.warning(f"Cache error for todo {todo_id}: {str(cache_exc)}")
         if cached_data:
             logger.info(f"Returning todo {todo_id} from cache")
-            return jsonify(cached_data), 200
+            return app.response_class(cached_data, status=200, mimetype='application/json')
 
         # If not in cache, get from database
         try:
-            db = next(get_db())
+            db = SessionScoped()
             todo = get_todo_by_id(db, todo_id)
         except Exception as db_exc:
             logger.warning(f"DB error for todo {todo_id}: {str(db_exc)}")
@@ -132,13 +243,13 @@ def get_todo(todo_id):
 
         if todo:
             logger.info(f"Returning todo {todo_id} from database")
-            return jsonify(todo.to_dict()), 200
+            return ojsonify(todo.to_dict(), 200)
         else:
             logger.info(f"Todo {todo_id} not found")
-            return jsonify({'error': 'Todo not found'}), 404
+            return ojsonify({'error': 'Todo not found'}, 404)
     except Exception as e:
         logger.error(f"Unexpected error fetching todo {todo_id}: {str(e)}")
-        return jsonify({'error': 'Internal server error'}), 500
+        return ojsonify({'error': 'Internal server error'}, 500)
 
 @app.route('/todos/<int:todo_id>', methods=['PUT'])
 def update_todo_route(todo_id):
@@ -146,31 +257,35 @@ def update_todo_route(todo_id):
         data = request.get_json()
         send_notification(todo_id, 'todo_updated', data)
 
-        return jsonify({
+        return ojsonify({
             'message': 'Todo update has been queued',
             'todo_id': todo_id
-        }), 202
+        }, 202)
     except Exception as e:
         logger.error(f"Error updating todo {todo_id}: {str(e)}")
-        return jsonify({'error': 'Internal server error'}), 500
+        return ojsonify({'error': 'Internal server error'}, 500)
 
 @app.route('/todos/<int:todo_id>', methods=['DELETE'])
 def delete_todo_route(todo_id):
     try:
-        db = next(get_db())
-        todo = db.query(Todo).filter(Todo.id == int(todo_id)).first()
-        if todo:
-            db.delete(todo)
-            db.commit()
+        db = SessionScoped()
+        # Single round trip: existence check and delete in one statement
+        result = db.execute(delete(Todo).where(Todo.id == todo_id).returning(Todo.id))
+        # Read the RETURNING row before the commit closes the result
+        deleted = result.scalar() is not None
+        db.commit()
+        if not deleted:
+            logger.info(f"Todo {todo_id} not found in database for deletion")
         send_notification(todo_id, 'todo_deleted')
 
-        return jsonify({
+        return ojsonify({
             'message': 'Todo deletion has been queued',
             'todo_id': todo_id
-        }), 202
+        }, 202)
     except Exception as e:
         logger.error(f"Error deleting todo {todo_id}: {str(e)}")
-        return jsonify({'error': 'Internal server error'}), 500
+        return ojsonify({'error': 'Internal server error'}, 500)
 
-if __name__ == '__main__':
+# Werkzeug's dev server is for local debugging only; gunicorn serves the app otherwise
+if __name__ == '__main__' and os.getenv('FLASK_DEV') == '1':
     app.run(host='0.0.0.0', port=3001)
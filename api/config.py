@@ -1,39 +1,37 @@
-import os
 import sys
+import time
 import boto3
-import psycopg2
 import redis
-from psycopg2 import sql
-from dotenv import load_dotenv
+from sqlalchemy import text
+from models import engine
+from settings import SETTINGS
 import json
 import logging
 
-# Configure logging
-logging.basicConfig(
-    level=logging.INFO,
-    format='%(asctime)s - %(name)s - %(levelname)s - [%(filename)s:%(lineno)d] - %(message)s'
-)
 logger = logging.getLogger(__name__)
 
-load_dotenv()
-
 # Database configuration
-DATABASE_URL = os.getenv('DATABASE_URL') or (
-    f"postgresql://{os.getenv('POSTGRES_USER')}:{os.getenv('POSTGRES_PASSWORD')}"
-    f"@{os.getenv('POSTGRES_HOST')}:{os.getenv('POSTGRES_PORT')}/{os.getenv('POSTGRES_DB')}"
-)
+DATABASE_URL = SETTINGS.database_url
 
 # Redis configuration
-REDIS_HOST = os.getenv('REDIS_HOST')
-REDIS_PORT = int(os.getenv('REDIS_PORT'))
+REDIS_HOST = SETTINGS.redis_host
+REDIS_PORT = SETTINGS.redis_port
 
 # SQS configuration
-SQS_REGION = os.getenv('SQS_REGION', 'ap-southeast-1')
+SQS_REGION = SETTINGS.sqs_region
 
 # Queue configuration
-QUEUE_NAME = os.getenv('SQS_QUEUE_NAME')
-QUEUE_URL = os.getenv('SQS_QUEUE_URL')
-DLQ_URL = os.getenv('SQS_DLQ_URL')
+QUEUE_NAME = SETTINGS.sqs_queue_name
+QUEUE_URL = SETTINGS.sqs_queue_url
+DLQ_URL = SETTINGS.sqs_dlq_url
+
+# Only the worker holding this lock runs the startup probes; the others wait
+# for the done marker it writes once they have all passed
+INIT_LOCK_KEY = 'init_lock'
+INIT_LOCK_TTL = 60
+INIT_DONE_KEY = 'init_done'
+INIT_DONE_TTL = 60
+INIT_WAIT_INTERVAL = 0.5
 
 # SQS setup
 def ensure_sqs_queue():
@@ -64,31 +62,39 @@ def ensure_sqs_queue():
         sys.exit(1)
 
 # DB setup
+TODOS_DDL = '''
+    CREATE TABLE IF NOT EXISTS todos (
+        id BIGSERIAL PRIMARY KEY,
+        title VARCHAR(255) NOT NULL,
+        description TEXT,
+        due_date TIMESTAMP,
+        priority VARCHAR(50) DEFAULT 'medium',
+        status VARCHAR(50) DEFAULT 'pending',
+        created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+        updated_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+    )
+'''
+
+# Tables created before ids moved to BIGINT still have an INTEGER id column
+TODOS_ID_BIGINT_DDL = '''
+    DO $$
+    BEGIN
+        IF EXISTS (
+            SELECT 1 FROM information_schema.columns
+            WHERE table_schema = current_schema() AND table_name = 'todos'
+                AND column_name = 'id' AND data_type = 'integer'
+        ) THEN
+            ALTER TABLE todos ALTER COLUMN id TYPE BIGINT;
+        END IF;
+    END $$
+'''
+
 def ensure_db_table():
     try:
-        conn = psycopg2.connect(
-            host=os.getenv('POSTGRES_HOST'),
-            port=int(os.getenv('POSTGRES_PORT')),
-            database=os.getenv('POSTGRES_DB'),
-            user=os.getenv('POSTGRES_USER'),
-            password=os.getenv('POSTGRES_PASSWORD')
-        )
-        cur = conn.cursor()
-        cur.execute('''
-            CREATE TABLE IF NOT EXISTS todos (
-                id SERIAL PRIMARY KEY,
-                title VARCHAR(255) NOT NULL,
-                description TEXT,
-                due_date TIMESTAMP,
-                priority VARCHAR(50) DEFAULT 'medium',
-                status VARCHAR(50) DEFAULT 'pending',
-                created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
-                updated_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
-            )
-        ''')
-        conn.commit()
-        cur.close()
-        conn.close()
+        # Run through the app's engine so the pool starts with a warm connection
+        with engine.begin() as conn:
+            conn.execute(text(TODOS_DDL))
+            conn.execute(text(TODOS_ID_BIGINT_DDL))
         logger.info("Database table 'todos' ensured.")
     except Exception as e:
         logger.error(f"Error ensuring DB table: {e}")
@@ -99,15 +105,30 @@ def ensure_redis():
     try:
         r = redis.Redis(
             host=REDIS_HOST,
-            port=REDIS_PORT
+            port=REDIS_PORT,
+            password=SETTINGS.redis_password
         )
         r.ping()
         logger.info("Redis connection ensured.")
+        return r
     except Exception as e:
         logger.error(f"Error ensuring Redis: {e}")
         sys.exit(1)
 
 def initialize_services():
-    ensure_sqs_queue()
-    ensure_db_table()
-    ensure_redis()
+    r = ensure_redis()
+    while True:
+        if r.exists(INIT_DONE_KEY):
+            logger.info("Services already initialized by another worker, skipping probes.")
+            return
+        if r.set(INIT_LOCK_KEY, '1', nx=True, ex=INIT_LOCK_TTL):
+            break
+        time.sleep(INIT_WAIT_INTERVAL)
+    try:
+        ensure_sqs_queue()
+        ensure_db_table()
+        r.set(INIT_DONE_KEY, '1', ex=INIT_DONE_TTL)
+    finally:
+        # Released on failure too (the probes exit via SystemExit), so a
+        # restarted worker runs them again instead of skipping them
+        r.delete(INIT_LOCK_KEY)
@@ -0,0 +1,15 @@
+import os
+
+# Server socket
+bind = os.getenv('GUNICORN_BIND', '0.0.0.0:3001')
+
+# Worker processes, each serving requests on a pool of threads
+worker_class = 'gthread'
+workers = int(os.getenv('GUNICORN_WORKERS', '2'))
+threads = int(os.getenv('GUNICORN_THREADS', '16'))
+
+# Keep worker heartbeat files in memory instead of on disk
+worker_tmp_dir = '/dev/shm'
+
+# Reload on code changes for local development only
+reload = os.getenv('GUNICORN_RELOAD', '0') == '1'
@@ -1,5 +1,5 @@
 CREATE TABLE IF NOT EXISTS todos (
-    id SERIAL PRIMARY KEY,
+    id BIGSERIAL PRIMARY KEY,
     title VARCHAR(255) NOT NULL,
     description TEXT,
     status VARCHAR(20) DEFAULT 'pending',
@@ -11,7 +11,7 @@ CREATE TABLE IF NOT EXISTS todos (
 
 CREATE TABLE IF NOT EXISTS todo_notifications (
     id SERIAL PRIMARY KEY,
-    todo_id INTEGER NOT NULL,
+    todo_id BIGINT NOT NULL,
     todo_title VARCHAR(100),
     todo_description TEXT,
     todo_status VARCHAR(20),
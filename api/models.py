@@ -1,29 +1,40 @@
-import os
+import operator
 from datetime import datetime
-from sqlalchemy import create_engine, Column, Integer, String, DateTime, Text
+from sqlalchemy import create_engine, BigInteger, Column, Integer, String, DateTime, Text
 from sqlalchemy.ext.declarative import declarative_base
-from sqlalchemy.orm import sessionmaker
-from dotenv import load_dotenv
-
-# Load environment variables
-load_dotenv()
+from sqlalchemy.orm import scoped_session, sessionmaker
+from settings import SETTINGS
 
 # Database connection
-DATABASE_URL = os.getenv('DATABASE_URL') or (
-    f"postgresql://{os.getenv('POSTGRES_USER')}:{os.getenv('POSTGRES_PASSWORD')}"
-    f"@{os.getenv('POSTGRES_HOST')}:{os.getenv('POSTGRES_PORT', '5432')}/{os.getenv('POSTGRES_DB')}"
-)
+DATABASE_URL = SETTINGS.database_url
 
 # SQLAlchemy setup
-engine = create_engine(DATABASE_URL)
+engine = create_engine(
+    DATABASE_URL,
+    pool_size=SETTINGS.db_pool_size,
+    max_overflow=SETTINGS.db_max_overflow,
+    pool_pre_ping=True,
+    pool_recycle=300,
+    pool_use_lifo=True
+)
 SessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=engine)
+# Request-scoped session, removed by the app on request teardown
+SessionScoped = scoped_session(SessionLocal)
 Base = declarative_base()
 
+# Serialized Todo fields, fetched in one C-level attrgetter call
+_TODO_COLS = (
+    'id', 'title', 'description', 'status', 'priority',
+    'due_date', 'created_at', 'updated_at'
+)
+_TODO_GET = operator.attrgetter(*_TODO_COLS)
+
 # Models
 class Todo(Base):
     __tablename__ = 'todos'
 
-    id = Column(Integer, primary_key=True, index=True)
+    # BIGINT: the ids app._next_id hands out are wider than 32 bits
+    id = Column(BigInteger, primary_key=True)
     title = Column(String(100), nullable=False)
     description = Column(Text)
     status = Column(String(20), default='pending')
@@ -33,22 +44,13 @@ class Todo(Base):
     updated_at = Column(DateTime, default=datetime.utcnow, onupdate=datetime.utcnow)
 
     def to_dict(self):
-        return {
-            'id': self.id,
-            'title': self.title,
-            'description': self.description,
-            'status': self.status,
-            'priority': self.priority,
-            'due_date': self.due_date.isoformat() if self.due_date else None,
-            'created_at': self.created_at.isoformat(),
-            'updated_at': self.updated_at.isoformat()
-        }
+        return dict(zip(_TODO_COLS, _TODO_GET(self)))
 
 class TodoNotification(Base):
     __tablename__ = 'todo_notifications'
 
     id = Column(Integer, primary_key=True)
-    todo_id = Column(Integer)
+    todo_id = Column(BigInteger)
     todo_title = Column(String(100))
     todo_description = Column(Text)
     todo_status = Column(String(20))
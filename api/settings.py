@@ -0,0 +1,76 @@
+import os
+from dataclasses import dataclass
+from typing import Optional
+from dotenv import load_dotenv
+
+# Load environment variables
+load_dotenv()
+
+@dataclass(frozen=True)
+class Settings:
+    """Service configuration, read from the environment once at import"""
+    # Database
+    database_url: str
+    postgres_host: Optional[str]
+    postgres_port: int
+    postgres_db: Optional[str]
+    postgres_user: Optional[str]
+    postgres_password: Optional[str]
+    db_pool_size: int
+    db_max_overflow: int
+
+    # Redis
+    redis_host: Optional[str]
+    redis_port: int
+    redis_password: Optional[str]
+    redis_pool_size: int
+
+    # SQS
+    sqs_region: str
+    sqs_queue_name: Optional[str]
+    sqs_queue_url: Optional[str]
+    sqs_dlq_url: Optional[str]
+    sqs_access_key: Optional[str]
+    sqs_secret_key: Optional[str]
+
+    # Logging
+    max_log_bytes: int
+
+# SQLAlchemy drives Postgres through psycopg 3; plain postgresql:// URLs
+# (as commonly given in DATABASE_URL) would otherwise select psycopg2
+def _psycopg_url(url):
+    scheme, sep, rest = url.partition('://')
+    if sep and scheme in ('postgres', 'postgresql'):
+        return f"postgresql+psycopg://{rest}"
+    return url
+
+def load_settings():
+    env = os.environ
+    postgres_port = int(env.get('POSTGRES_PORT', '5432'))
+    database_url = _psycopg_url(env.get('DATABASE_URL') or (
+        f"postgresql://{env.get('POSTGRES_USER')}:{env.get('POSTGRES_PASSWORD')}"
+        f"@{env.get('POSTGRES_HOST')}:{postgres_port}/{env.get('POSTGRES_DB')}"
+    ))
+    return Settings(
+        database_url=database_url,
+        postgres_host=env.get('POSTGRES_HOST'),
+        postgres_port=postgres_port,
+        postgres_db=env.get('POSTGRES_DB'),
+        postgres_user=env.get('POSTGRES_USER'),
+        postgres_password=env.get('POSTGRES_PASSWORD'),
+        db_pool_size=int(env.get('DB_POOL_SIZE', '25')),
+        db_max_overflow=int(env.get('DB_MAX_OVERFLOW', '25')),
+        redis_host=env.get('REDIS_HOST'),
+        redis_port=int(env.get('REDIS_PORT', '6379')),
+        redis_password=env.get('REDIS_PASSWORD'),
+        redis_pool_size=int(env.get('REDIS_POOL', '64')),
+        sqs_region=env.get('SQS_REGION', 'ap-southeast-1'),
+        sqs_queue_name=env.get('SQS_QUEUE_NAME'),
+        sqs_queue_url=env.get('SQS_QUEUE_URL'),
+        sqs_dlq_url=env.get('SQS_DLQ_URL'),
+        sqs_access_key=env.get('SQS_ACCESS_KEY'),
+        sqs_secret_key=env.get('SQS_SECRET_KEY'),
+        max_log_bytes=int(env.get('MAX_LOG_BYTES', '2048'))
+    )
+
+SETTINGS = load_settings()
@@ -1,5 +1,7 @@
 import pytest
-from app import app
+from app import app, _next_id
+from models import SessionLocal, Todo
+from util import reserve_todo_ids, TODO_ID_BLOCK_SIZE
 import json
 from datetime import datetime, timedelta
 
@@ -111,3 +113,44 @@ def test_missing_required_fields(client):
     assert response.status_code == 500
     data = json.loads(response.data)
     assert 'error' in data
+
+def test_next_id_unique_and_js_safe():
+    # Spans several reserved blocks
+    ids = [_next_id() for _ in range(1000)]
+    assert len(set(ids)) == len(ids)
+    assert all(0 < todo_id < 2 ** 53 for todo_id in ids)
+
+def test_reserved_id_blocks_do_not_overlap():
+    # Each process reserves its own blocks from the shared sequence
+    first, second = reserve_todo_ids(), reserve_todo_ids()
+    assert len(first) == len(second) == TODO_ID_BLOCK_SIZE
+    assert not set(first) & set(second)
+
+def test_delete_existing_todo(client):
+    todo_id = _next_id()
+    db = SessionLocal()
+    try:
+        db.add(Todo(id=todo_id, title='Test Todo'))
+        db.commit()
+    finally:
+        db.close()
+
+    response = client.delete(f'/todos/{todo_id}')
+    assert response.status_code == 202
+    data = json.loads(response.data)
+    assert data['todo_id'] == todo_id
+
+    db = SessionLocal()
+    try:
+        assert db.get(Todo, todo_id) is None
+    finally:
+        db.close()
+
+def test_delete_todo_not_in_database(client):
+    # The create may still be queued, so the delete is queued regardless
+    todo_id = _next_id()
+    response = client.delete(f'/todos/{todo_id}')
+    assert response.status_code == 202
+    data = json.loads(response.data)
+    assert data['message'] == 'Todo deletion has been queued'
+    assert data['todo_id'] == todo_id
@@ -1,36 +1,39 @@
-import os
 import json
+import asyncio
+import atexit
+import threading
+import time
+import aioboto3
 import boto3
+import orjson
+from botocore.config import Config
 from datetime import datetime
 import redis
-from dotenv import load_dotenv
-from config import QUEUE_NAME, QUEUE_URL, DLQ_URL
+from config import QUEUE_URL, DLQ_URL
+from settings import SETTINGS
 import logging
+from sqlalchemy import bindparam, lambda_stmt, select, text
 from sqlalchemy.orm import Session
-from models import Todo, get_db
+from models import SessionLocal, Todo, engine
 
-# Configure logging
-logging.basicConfig(
-    level=logging.INFO,
-    format='%(asctime)s - %(name)s - %(levelname)s - %(message)s'
-)
 logger = logging.getLogger(__name__)
 
-load_dotenv()
-
 # Initialize Redis client
-redis_host = os.getenv('REDIS_HOST')
-redis_port = int(os.getenv('REDIS_PORT'))
-redis_password = os.getenv('REDIS_PASSWORD')
+redis_host = SETTINGS.redis_host
+redis_port = SETTINGS.redis_port
+redis_password = SETTINGS.redis_password
+redis_pool_size = SETTINGS.redis_pool_size
 
 logger.info(f"Initializing Redis client with host: {redis_host}, port: {redis_port}")
 
-redis_client = redis.Redis(
+# Bounded pool shared by all request threads (plain TCP, no SSL)
+_POOL = redis.BlockingConnectionPool(
+    max_connections=redis_pool_size,
     host=redis_host,
     port=redis_port,
-    password=redis_password,
-    ssl=False,  # Disable SSL
+    password=redis_password
 )
+redis_client = redis.Redis(connection_pool=_POOL)
 
 # Test Redis connection
 try:
@@ -42,181 +45,300 @@ except Exception as e:
 
 # Initialize SQS client
 sqs_config = {
-    'region_name': os.getenv('SQS_REGION'),
-    'endpoint_url': os.getenv('SQS_QUEUE_URL')
+    'region_name': SETTINGS.sqs_region,
+    'endpoint_url': SETTINGS.sqs_queue_url
 }
 
 # Only add AWS credentials for local development
 if 'elasticmq' in sqs_config['endpoint_url']:
     sqs_config.update({
-        'aws_access_key_id': os.getenv('SQS_ACCESS_KEY'),
-        'aws_secret_access_key': os.getenv('SQS_SECRET_KEY')
+        'aws_access_key_id': SETTINGS.sqs_access_key,
+        'aws_secret_access_key': SETTINGS.sqs_secret_key
     })
 
-sqs = boto3.client('sqs', **sqs_config)
+# Enough pooled connections for concurrent senders; fail fast on a degraded endpoint
+sqs_client_config = Config(
+    max_pool_connections=64,
+    connect_timeout=1,
+    read_timeout=3,
+    retries={'max_attempts': 3, 'mode': 'adaptive'}
+)
+
+sqs = boto3.client('sqs', config=sqs_client_config, **sqs_config)
 
 # Database operations
-def get_all_todos(db: Session):
-    logger.info("Fetching all todos from database")
-    todos = db.query(Todo).all()
-    logger.info(f"Found {len(todos)} todos in database")
-    return todos
+# Primary-key lookup, compiled once and reused from SQLAlchemy's statement cache
+_GET_TODO = lambda_stmt(lambda: select(Todo).where(Todo.id == bindparam('id')))
+
+def stream_all_todos(db: Session):
+    """Fetch all todos as plain row mappings, skipping ORM object hydration"""
+    logger.info("Streaming all todos from database")
+    stmt = select(
+        Todo.id, Todo.title, Todo.description, Todo.status, Todo.priority,
+        Todo.due_date, Todo.created_at, Todo.updated_at
+    ).execution_options(yield_per=500)
+    return db.execute(stmt).mappings()
+
+# Todo ids are reserved from the todos id sequence in blocks: every process
+# and host gets distinct ids, with one database round trip per block
+TODO_ID_BLOCK_SIZE = 100
+_RESERVE_TODO_IDS = text(
+    "SELECT nextval(pg_get_serial_sequence('todos', 'id')) "
+    f"FROM generate_series(1, {TODO_ID_BLOCK_SIZE})"
+)
+
+def reserve_todo_ids():
+    """Reserve the next block of todo ids; unused ones are simply skipped"""
+    db = SessionLocal()
+    try:
+        return db.execute(_RESERVE_TODO_IDS).scalars().all()
+    finally:
+        db.close()
 
 def get_todo_by_id(db: Session, todo_id: int):
     logger.info(f"Fetching todo with id {todo_id} from database")
-    todo = db.query(Todo).filter(Todo.id == todo_id).first()
+    todo = db.execute(_GET_TODO, {'id': todo_id}).scalar_one_or_none()
     if todo:
         logger.info(f"Found todo {todo_id} in database")
     else:
         logger.info(f"Todo {todo_id} not found in database")
     return todo
 
-def create_todo(db: Session, todo_data: dict):
-    logger.info("Creating new todo in database")
-    todo = Todo(**todo_data)
-    db.add(todo)
-    db.commit()
-    db.refresh(todo)
-    logger.info(f"Created todo with id {todo.id} in database")
-    return todo
-
-def update_todo(db: Session, todo_id: int, todo_data: dict):
-    logger.info(f"Updating todo {todo_id} in database")
-    todo = db.query(Todo).filter(Todo.id == todo_id).first()
-    if todo:
-        for key, value in todo_data.items():
-            setattr(todo, key, value)
-        db.commit()
-        db.refresh(todo)
-        logger.info(f"Updated todo {todo_id} in database")
-        return todo
-    logger.info(f"Todo {todo_id} not found in database for update")
-    return None
-
-def delete_todo(db: Session, todo_id: int):
-    logger.info(f"Deleting todo {todo_id} from database")
-    todo = db.query(Todo).filter(Todo.id == todo_id).first()
-    if todo:
-        db.delete(todo)
-        db.commit()
-        logger.info(f"Deleted todo {todo_id} from database")
-        return True
-    logger.info(f"Todo {todo_id} not found in database for deletion")
-    return False
-
 # Cache operations
+# Cached todos are stored as encoded JSON so hits can be returned as-is;
+# the worker keeps every todo in one hash of todo id -> encoded todo JSON
+ALL_TODOS_KEY = 'all_todos_h'
+
 def get_cached_todos():
     logger.info("Fetching todos from Redis cache")
-    cached_data = redis_client.get('all_todos')
+    cached_data = redis_client.hgetall(ALL_TODOS_KEY)
     if cached_data:
         logger.info("Found todos in Redis cache")
-        return json.loads(cached_data)
+        return b'[' + b','.join(cached_data[k] for k in sorted(cached_data, key=int)) + b']'
     logger.info("No todos found in Redis cache")
     return None
 
 def get_cached_todo(todo_id: int):
     logger.info(f"Fetching todo {todo_id} from Redis cache")
-    cached_data = redis_client.get(f'todo:{todo_id}')
+    cached_data = redis_client.hget(ALL_TODOS_KEY, todo_id)
     if cached_data:
         logger.info(f"Found todo {todo_id} in Redis cache")
-        return json.loads(cached_data)
+        return cached_data
     logger.info(f"Todo {todo_id} not found in Redis cache")
     return None
 
+# Request log buffer
+REQUEST_LOG_KEY = 'reqlog'
+
+def push_request_log(record):
+    """Buffer a request log record in Redis"""
+    redis_client.lpush(REQUEST_LOG_KEY, orjson.dumps(record))
+
+def pop_request_logs(count):
+    """Pop up to count buffered request log records, oldest first"""
+    return redis_client.rpop(REQUEST_LOG_KEY, count) or []
+
 # Health check functions
 def check_postgres():
     try:
-        db = next(get_db())
-        version = db.execute("SELECT version()").scalar()
-        db.close()
-        logger.info("PostgreSQL health check passed")
-        return {'status': 'healthy', 'version': version}
+        db = SessionLocal()
+        try:
+            version = db.execute(text("SELECT version()")).scalar()
+        finally:
+            db.close()
+        pool_status = engine.pool.status()
+        logger.info(f"PostgreSQL health check passed - {pool_status}")
+        return {'status': 'healthy', 'version': version, 'pool': pool_status}
     except Exception as e:
         logger.error(f"PostgreSQL health check failed: {str(e)}")
         return {'status': 'unhealthy', 'error': str(e)}
 
 def check_redis():
     try:
-        redis_client.ping()
         test_key = 'health_check_test'
-        redis_client.set(test_key, 'ok')
-        value = redis_client.get(test_key)
-        redis_client.delete(test_key)
+        pipe = redis_client.pipeline(transaction=False)
+        pipe.ping()
+        pipe.set(test_key, 'ok')
+        pipe.get(test_key)
+        pipe.delete(test_key)
+        pipe.info()
+        _, _, value, _, info = pipe.execute()
         if value != b'ok':
             raise Exception('Redis set/get test failed')
         logger.info("Redis health check passed")
-        return {'status': 'healthy', 'version': redis_client.info()['redis_version']}
+        return {'status': 'healthy', 'version': info['redis_version']}
     except Exception as e:
         logger.error(f"Redis health check failed: {str(e)}")
         return {'status': 'unhealthy', 'error': str(e)}
 
+# Queue existence is re-verified at most this often
+ELASTICMQ_CHECK_TTL = 60
+_elasticmq_last_ok_ts = 0.0
+_elasticmq_last_status = None
+
 def check_elasticmq():
+    global _elasticmq_last_ok_ts, _elasticmq_last_status
+    if _elasticmq_last_status and time.time() - _elasticmq_last_ok_ts < ELASTICMQ_CHECK_TTL:
+        return _elasticmq_last_status
     try:
-        response = sqs.list_queues()
-        queues = response.get('QueueUrls', [])
-        queue_exists = any(QUEUE_NAME in q for q in queues)
-        if not queue_exists:
-            logger.error(f"Required queue {QUEUE_NAME} not found")
-            return {'status': 'unhealthy', 'error': f'Required queue {QUEUE_NAME} not found'}
+        response = sqs.get_queue_attributes(
+            QueueUrl=QUEUE_URL,
+            AttributeNames=['ApproximateNumberOfMessages']
+        )
+        messages = int(response['Attributes']['ApproximateNumberOfMessages'])
         logger.info("ElasticMQ health check passed")
-        return {'status': 'healthy', 'queues': len(queues)}
+        _elasticmq_last_status = {'status': 'healthy', 'messages': messages}
+        _elasticmq_last_ok_ts = time.time()
+        return _elasticmq_last_status
     except Exception as e:
         logger.error(f"ElasticMQ health check failed: {str(e)}")
         return {'status': 'unhealthy', 'error': str(e)}
 
-def send_notification(todo_id, action, todo_data=None):
-    """Send a notification to SQS queue"""
+# Notification batching
+# Notifications are sent from an asyncio loop running in its own thread
+NOTIFY_BATCH_SIZE = 10  # SendMessageBatch limit
+NOTIFY_MAX_BATCH_BYTES = 256 * 1024  # SendMessageBatch limit on the summed bodies
+NOTIFY_LINGER_SECONDS = 0.02
+NOTIFY_MAX_ATTEMPTS = 3
+NOTIFY_RETRY_DELAY = 0.5
+NOTIFY_MAX_IN_FLIGHT = 32
+NOTIFY_FLUSH_TIMEOUT = 5
+
+_LOOP = asyncio.new_event_loop()
+# Created on _LOOP by _sqs_worker: before Python 3.10 an asyncio.Queue binds
+# to the event loop of the thread that creates it
+_q = None
+_Q_READY = threading.Event()
+
+# Queued notifications are (encoded body, body size in bytes, attempts so far)
+# A notification taken from the queue that did not fit in the previous batch
+_held = None
+
+async def _take_notification_batch():
+    """Wait for the next notification, then gather more until the batch is full or the linger time passes"""
+    global _held
+    if _held is not None:
+        batch, _held = [_held], None
+    else:
+        batch = [await _q.get()]
+    size = batch[0][1]
+    deadline = _LOOP.time() + NOTIFY_LINGER_SECONDS
+    while len(batch) < NOTIFY_BATCH_SIZE:
+        remaining = deadline - _LOOP.time()
+        if remaining <= 0:
+            break
+        try:
+            item = await asyncio.wait_for(_q.get(), remaining)
+        except asyncio.TimeoutError:
+            break
+        if size + item[1] > NOTIFY_MAX_BATCH_BYTES:
+            _held = item
+            break
+        batch.append(item)
+        size += item[1]
+    return batch
+
+async def _requeue_notifications(items):
+    """Put failed notifications back on the queue until they run out of attempts"""
+    retry = []
+    for body, size, attempts in items:
+        if attempts + 1 < NOTIFY_MAX_ATTEMPTS:
+            retry.append((body, size, attempts + 1))
+        else:
+            logger.error(f"Dropping notification after {NOTIFY_MAX_ATTEMPTS} attempts: {body}")
+    if retry:
+        await asyncio.sleep(NOTIFY_RETRY_DELAY * 2 ** (retry[0][2] - 1))
+        for item in retry:
+            _q.put_nowait(item)
+
+async def _send_notification_batch(sqs_async, batch, semaphore):
+    retry = []
     try:
-        message = {
-            'todo_id': todo_id,
-            'action': action,
-            'timestamp': datetime.utcnow().isoformat()
-        }
-
-        if todo_data:
-            # Ensure todo_data is a dictionary
-            if not isinstance(todo_data, dict):
-                logger.error(f"todo_data must be a dictionary, got {type(todo_data)}")
-                return None
-
-            # Log the todo_data before adding it to the message
-            logger.info(f"Adding todo_data to message: {todo_data}")
-            message.update(todo_data)
-
-        # Log the final message before sending
-        logger.info(f"Sending message to SQS: {message}")
-
-        response = sqs.send_message(
+        response = await sqs_async.send_message_batch(
             QueueUrl=QUEUE_URL,
-            MessageBody=json.dumps(message)
+            Entries=[
+                {'Id': str(i), 'MessageBody': body}
+                for i, (body, _, _) in enumerate(batch)
+            ]
         )
-        logger.info(f"Notification sent successfully: {message}")
-        return response
+        for failed in response.get('Failed', []):
+            item = batch[int(failed['Id'])]
+            logger.error(f"Error sending notification: {item[0]} - {failed.get('Message')}")
+            # Sender faults (a malformed entry) fail the same way every time
+            if not failed.get('SenderFault'):
+                retry.append(item)
+        logger.info(f"Sent {len(response.get('Successful', []))} notifications to SQS")
     except Exception as e:
-        logger.error(f"Error sending notification: {e}")
-        return None
-
-def update_cache(todo_id, todo_data):
-    """Update Redis cache with todo data"""
+        logger.error(f"Error sending notification batch: {e}")
+        retry = batch
+    finally:
+        semaphore.release()
     try:
-        redis_client.set(f"todo:{todo_id}", json.dumps(todo_data))
-        logger.info(f"Cache updated for todo {todo_id}")
-    except Exception as e:
-        logger.error(f"Error updating cache: {e}")
+        await _requeue_notifications(retry)
+    finally:
+        # Re-queued notifications are counted again, so flush still waits for them
+        for _ in batch:
+            _q.task_done()
+
+async def _sqs_worker():
+    global _q
+    _q = asyncio.Queue()
+    _Q_READY.set()
+    semaphore = asyncio.Semaphore(NOTIFY_MAX_IN_FLIGHT)
+    in_flight = set()
+    session = aioboto3.Session()
+    while True:
+        try:
+            async with session.client('sqs', config=sqs_client_config, **sqs_config) as sqs_async:
+                while True:
+                    batch = await _take_notification_batch()
+                    await semaphore.acquire()
+                    task = asyncio.create_task(_send_notification_batch(sqs_async, batch, semaphore))
+                    in_flight.add(task)
+                    task.add_done_callback(in_flight.discard)
+        except Exception as e:
+            logger.error(f"SQS notification worker failed, restarting: {e}")
+            await asyncio.sleep(1)
+
+def _run_sqs_worker():
+    asyncio.set_event_loop(_LOOP)
+    _LOOP.run_until_complete(_sqs_worker())
 
-def get_from_cache(todo_id):
-    """Get todo data from Redis cache"""
+def flush_notifications():
+    """Wait until every queued notification has been sent"""
     try:
-        data = redis_client.get(f"todo:{todo_id}")
-        return json.loads(data) if data else None
+        asyncio.run_coroutine_threadsafe(_q.join(), _LOOP).result(timeout=NOTIFY_FLUSH_TIMEOUT)
     except Exception as e:
-        logger.error(f"Error getting from cache: {e}")
+        logger.error(f"Error flushing notifications: {e}")
+
+threading.Thread(target=_run_sqs_worker, name='sqs-notifier', daemon=True).start()
+_Q_READY.wait(NOTIFY_FLUSH_TIMEOUT)
+atexit.register(flush_notifications)
+
+def send_notification(todo_id, action, todo_data=None):
+    """Queue a notification to be sent to SQS in the next batch"""
+    message = {
+        'todo_id': todo_id,
+        'action': action,
+        'timestamp': datetime.utcnow().isoformat()
+    }
+
+    if todo_data:
+        # Ensure todo_data is a dictionary
+        if not isinstance(todo_data, dict):
+            logger.error(f"todo_data must be a dictionary, got {type(todo_data)}")
+            return None
+
+        # Log the todo_data before adding it to the message
+        logger.info(f"Adding todo_data to message: {todo_data}")
+        message.update(todo_data)
+
+    body = json.dumps(message)
+    size = len(body.encode('utf-8'))
+    if size > NOTIFY_MAX_BATCH_BYTES:
+        logger.error(f"Notification for todo {todo_id} is {size} bytes, over the SQS limit; not sent")
         return None
 
-def delete_from_cache(todo_id):
-    """Delete todo data from Redis cache"""
-    try:
-        redis_client.delete(f"todo:{todo_id}")
-        logger.info(f"Cache deleted for todo {todo_id}")
-    except Exception as e:
-        logger.error(f"Error deleting from cache: {e}")
+    logger.info(f"Queueing message for SQS: {message}")
+    _LOOP.call_soon_threadsafe(_q.put_nowait, (body, size, 0))
+    return message
@@ -0,0 +1,37 @@
+from aiobotocore.config import AioConfig
+from aiobotocore.session import get_session
+from config import QUEUE_URL, SQS_REGION, SQS_ACCESS_KEY, SQS_SECRET_KEY
+
+# Initialize SQS client
+sqs_config = {
+    'region_name': SQS_REGION,
+}
+
+# Only add endpoint URL and credentials for local development
+if 'elasticmq' in QUEUE_URL:
+    sqs_config.update({
+        'endpoint_url': QUEUE_URL,
+        'aws_access_key_id': SQS_ACCESS_KEY,
+        'aws_secret_access_key': SQS_SECRET_KEY
+    })
+
+# aiobotocore ignores botocore's tcp_keepalive socket option; what aiohttp
+# honours is how long an idle pooled connection is kept for reuse (12s by
+# default), so keep it well past the gap between two long polls
+SQS_KEEPALIVE_TIMEOUT = 75
+
+sqs_client_options = {
+    'connector_args': {'keepalive_timeout': SQS_KEEPALIVE_TIMEOUT},
+    'retries': {'mode': 'standard', 'max_attempts': 3}
+}
+
+def create_async_sqs_client():
+    """Create the async SQS client used by the worker's event loop.
+
+    Returns an async context manager; the worker opens it once for its lifetime.
+    """
+    return get_session().create_client(
+        'sqs',
+        config=AioConfig(**sqs_client_options),
+        **sqs_config
+    )
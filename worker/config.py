@@ -1,134 +1,48 @@
 import os
-import sys
-import boto3
-import psycopg2
-import redis
-from psycopg2 import sql
-from datetime import datetime
-from sqlalchemy import create_engine, Column, Integer, String, DateTime, Text
-from sqlalchemy.ext.declarative import declarative_base
-from sqlalchemy.orm import sessionmaker
 from dotenv import load_dotenv
-import json
-import logging
-
-# Configure logging
-logging.basicConfig(
-    level=logging.INFO,
-    format='%(asctime)s - %(name)s - %(levelname)s - [%(filename)s:%(lineno)d] - %(message)s'
-)
-logger = logging.getLogger(__name__)
 
 # Load environment variables
 load_dotenv()
 
+# Environment is read once here; everything else uses these constants
+
 # Database connection
-DATABASE_URL = os.getenv('DATABASE_URL') or (
-    f"postgresql://{os.getenv('POSTGRES_USER')}:{os.getenv('POSTGRES_PASSWORD')}"
-    f"@{os.getenv('POSTGRES_HOST')}:{os.getenv('POSTGRES_PORT')}/{os.getenv('POSTGRES_DB')}"
-)
+POSTGRES_HOST = os.getenv('POSTGRES_HOST')
+POSTGRES_PORT = int(os.getenv('POSTGRES_PORT', '5432'))
+POSTGRES_DB = os.getenv('POSTGRES_DB')
+POSTGRES_USER = os.getenv('POSTGRES_USER')
+POSTGRES_PASSWORD = os.getenv('POSTGRES_PASSWORD')
+
+# SQLAlchemy drives Postgres through psycopg 3; plain postgresql:// URLs
+# (as commonly given in DATABASE_URL) would otherwise select psycopg2
+def _psycopg_url(url):
+    scheme, sep, rest = url.partition('://')
+    if sep and scheme in ('postgres', 'postgresql'):
+        return f"postgresql+psycopg://{rest}"
+    return url
+
+DATABASE_URL = _psycopg_url(os.getenv('DATABASE_URL') or (
+    f"postgresql://{POSTGRES_USER}:{POSTGRES_PASSWORD}"
+    f"@{POSTGRES_HOST}:{POSTGRES_PORT}/{POSTGRES_DB}"
+))
+
+# Connection pool sizing
+DB_POOL_SIZE = int(os.getenv('DB_POOL_SIZE', '10'))
+DB_MAX_OVERFLOW = int(os.getenv('DB_MAX_OVERFLOW', '5'))
 
 # Redis configuration
 REDIS_HOST = os.getenv('REDIS_HOST')
 REDIS_PORT = int(os.getenv('REDIS_PORT'))
+REDIS_PASSWORD = os.getenv('REDIS_PASSWORD')
 
 # SQS configuration
 SQS_REGION = os.getenv('SQS_REGION', 'ap-southeast-1')
+SQS_ACCESS_KEY = os.getenv('SQS_ACCESS_KEY')
+SQS_SECRET_KEY = os.getenv('SQS_SECRET_KEY')
 
 # Queue URLs from environment variables
 QUEUE_URL = os.getenv('SQS_QUEUE_URL')
 DLQ_URL = os.getenv('SQS_DLQ_URL')
 
-# SQLAlchemy setup
-engine = create_engine(DATABASE_URL)
-SessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=engine)
-Base = declarative_base()
-
-# Dependency injection-style DB session
-def get_db():
-    db = SessionLocal()
-    try:
-        yield db
-    finally:
-        db.close()
-
-# Initialize all tables
-def init_db():
-    Base.metadata.create_all(bind=engine)
-
-# SQS setup
-def ensure_sqs_queue():
-    # Configure SQS client
-    sqs_config = {
-        'region_name': SQS_REGION,
-    }
-
-    # Only add endpoint URL and credentials for local development
-    if 'elasticmq' in QUEUE_URL:
-        sqs_config.update({
-            'endpoint_url': QUEUE_URL,
-            'aws_access_key_id': os.getenv('SQS_ACCESS_KEY'),
-            'aws_secret_access_key': os.getenv('SQS_SECRET_KEY')
-        })
-
-    sqs = boto3.client('sqs', **sqs_config)
-
-    try:
-        # Verify queue access
-        sqs.get_queue_attributes(
-            QueueUrl=QUEUE_URL,
-            AttributeNames=['QueueArn']
-        )
-        logger.info("SQS queue access verified.")
-    except Exception as e:
-        logger.error(f"Error accessing SQS queue: {e}")
-        sys.exit(1)
-
-# DB setup
-def ensure_db_table():
-    try:
-        conn = psycopg2.connect(
-            host=os.getenv('POSTGRES_HOST'),
-            port=int(os.getenv('POSTGRES_PORT')),
-            database=os.getenv('POSTGRES_DB'),
-            user=os.getenv('POSTGRES_USER'),
-            password=os.getenv('POSTGRES_PASSWORD')
-        )
-        cur = conn.cursor()
-        cur.execute('''
-            CREATE TABLE IF NOT EXISTS todos (
-                id SERIAL PRIMARY KEY,
-                title VARCHAR(255) NOT NULL,
-                description TEXT,
-                due_date TIMESTAMP,
-                priority VARCHAR(50) DEFAULT 'medium',
-                status VARCHAR(50) DEFAULT 'pending',
-                created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
-                updated_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
-            )
-        ''')
-        conn.commit()
-        cur.close()
-        conn.close()
-        logger.info("Database table 'todos' ensured.")
-    except Exception as e:
-        logger.error(f"Error ensuring DB table: {e}")
-        sys.exit(1)
-
-# Redis setup
-def ensure_redis():
-    try:
-        r = redis.Redis(
-            host=REDIS_HOST,
-            port=REDIS_PORT
-        )
-        r.ping()
-        logger.info("Redis connection ensured.")
-    except Exception as e:
-        logger.error(f"Error ensuring Redis: {e}")
-        sys.exit(1)
-
-def initialize_services():
-    ensure_sqs_queue()
-    ensure_db_table()
-    ensure_redis()
+# Startup schema creation; set to 0 where a migration job owns the schema
+RUN_MIGRATIONS = os.getenv('RUN_MIGRATIONS', '1') == '1'
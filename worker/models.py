@@ -1,21 +1,16 @@
-import os
 from datetime import datetime
-from sqlalchemy import create_engine, Column, Integer, String, DateTime, Text
+from sqlalchemy import create_engine, BigInteger, Column, Integer, String, DateTime, Text
 from sqlalchemy.ext.declarative import declarative_base
 from sqlalchemy.orm import sessionmaker
-from dotenv import load_dotenv
-
-# Load environment variables
-load_dotenv()
-
-# Database connection
-DATABASE_URL = os.getenv('DATABASE_URL') or (
-    f"postgresql://{os.getenv('POSTGRES_USER')}:{os.getenv('POSTGRES_PASSWORD')}"
-    f"@{os.getenv('POSTGRES_HOST')}:{os.getenv('POSTGRES_PORT', '5432')}/{os.getenv('POSTGRES_DB')}"
-)
+from config import DATABASE_URL, DB_POOL_SIZE, DB_MAX_OVERFLOW
 
 # SQLAlchemy setup
-engine = create_engine(DATABASE_URL)
+engine = create_engine(
+    DATABASE_URL,
+    pool_size=DB_POOL_SIZE,
+    max_overflow=DB_MAX_OVERFLOW,
+    pool_pre_ping=True
+)
 SessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=engine)
 Base = declarative_base()
 
@@ -23,11 +18,13 @@ Base = declarative_base()
 class Todo(Base):
     __tablename__ = 'todos'
 
-    id = Column(Integer, primary_key=True, index=True)
-    title = Column(String(100), nullable=False)
+    # Column types match the todos table DDL run by the API; ids are
+    # BIGINT because the API issues millisecond-based ids wider than 32 bits
+    id = Column(BigInteger, primary_key=True)
+    title = Column(String(255), nullable=False)
     description = Column(Text)
-    status = Column(String(20), default='pending')
-    priority = Column(String(20), default='medium')
+    status = Column(String(50), default='pending')
+    priority = Column(String(50), default='medium')
     due_date = Column(DateTime, nullable=True)
     created_at = Column(DateTime, default=datetime.utcnow)
     updated_at = Column(DateTime, default=datetime.utcnow, onupdate=datetime.utcnow)
@@ -48,8 +45,8 @@ class TodoNotification(Base):
     __tablename__ = 'todo_notifications'
 
     id = Column(Integer, primary_key=True)
-    todo_id = Column(Integer)
-    todo_title = Column(String(100))
+    todo_id = Column(BigInteger)
+    todo_title = Column(String(255))
     todo_description = Column(Text)
     todo_status = Column(String(20))
     todo_priority = Column(String(20))
@@ -1,15 +1,40 @@
+import time
+import msgspec
 import pytest
-from worker import process_notification
+import redis
+import sqlalchemy.exc
+from sqlalchemy.dialects.postgresql import psycopg
+from models import Todo
+from worker import (
+    process_notification, update_all_todos_cache, apply_todo_cache_changes, _retry,
+    _MSG_DECODER, _present_fields,
+    ALL_TODOS_KEY, ALL_TODOS_TTL, RETRY_ATTEMPTS, DEDUP_TTL, REBUILD_BATCH_SIZE
+)
 import json
 from datetime import datetime, timedelta
 
 @pytest.fixture
 def mock_db(mocker):
     mock_session = mocker.Mock()
-    mock_session.query.return_value.filter.return_value.first.return_value = None
-    mocker.patch('worker.get_db_session', return_value=mock_session)
+    mock_session.get.return_value = None
+    mocker.patch('worker.SessionLocal', return_value=mock_session)
     return mock_session
 
+@pytest.fixture
+def mock_redis(mocker):
+    mock_client = mocker.patch('worker.redis_client')
+    mock_client.exists.return_value = 0
+    return mock_client
+
+def api_todo_id():
+    # Beyond INTEGER range, as ids issued under the earlier millisecond
+    # scheme are; todos.id is BIGINT so they must still round-trip
+    return (int(time.time() * 1000) << 10) | 0x3FF
+
+def create_message(todo_id, **fields):
+    # Same flat layout the API's send_notification produces
+    return {'Body': json.dumps({'todo_id': todo_id, 'action': 'todo_created', **fields})}
+
 def test_process_todo_created(mock_db):
     todo_data = {
         'title': 'Test Todo',
@@ -21,7 +46,7 @@ def test_process_todo_created(mock_db):
         'Body': json.dumps({
             'todo_id': 123,
             'action': 'todo_created',
-            'todo_data': todo_data
+            **todo_data
         })
     }
     process_notification(message)
@@ -38,7 +63,7 @@ def test_process_todo_updated(mock_db):
         'Body': json.dumps({
             'todo_id': 123,
             'action': 'todo_updated',
-            'todo_data': todo_data
+            **todo_data
         })
     }
     process_notification(message)
@@ -84,8 +109,146 @@ def test_process_missing_todo_id():
     message = {
         'Body': json.dumps({
             'action': 'todo_created',
-            'todo_data': {'title': 'Test Todo'}
+            'title': 'Test Todo'
         })
     }
     with pytest.raises(Exception):
         process_notification(message)
+
+def test_create_marks_processed_after_commit(mock_db, mock_redis):
+    calls = []
+    mock_db.commit.side_effect = lambda: calls.append('commit')
+    mock_redis.set.side_effect = lambda *args, **kwargs: calls.append('set')
+    success, change = process_notification(create_message(123, title='Test Todo'))
+    assert success
+    assert change[0] == 123
+    assert calls == ['commit', 'set']
+    mock_redis.set.assert_called_once_with('dedup:todo_created:123', 1, ex=DEDUP_TTL)
+
+def test_create_failed_commit_leaves_no_marker(mock_db, mock_redis):
+    mock_db.commit.side_effect = sqlalchemy.exc.OperationalError('INSERT', {}, Exception('gone'))
+    with pytest.raises(sqlalchemy.exc.OperationalError):
+        process_notification(create_message(123, title='Test Todo'))
+    mock_redis.set.assert_not_called()
+
+def test_create_redelivery_skipped_by_marker(mock_db, mock_redis):
+    mock_redis.exists.return_value = 1
+    assert process_notification(create_message(123, title='Test Todo')) == (True, None)
+    mock_db.get.assert_not_called()
+    mock_db.add.assert_not_called()
+
+def test_create_redelivery_skipped_by_database(mocker, mock_db, mock_redis):
+    # Committed, but the marker was never written
+    mock_db.get.return_value = mocker.Mock()
+    assert process_notification(create_message(123, title='Test Todo')) == (True, None)
+    mock_db.add.assert_not_called()
+    mock_redis.set.assert_called_once_with('dedup:todo_created:123', 1, ex=DEDUP_TTL)
+
+def test_create_concurrent_duplicate(mocker, mock_db, mock_redis):
+    mock_db.get.side_effect = [None, mocker.Mock()]
+    mock_db.commit.side_effect = sqlalchemy.exc.IntegrityError('INSERT', {}, Exception('duplicate key'))
+    assert process_notification(create_message(123, title='Test Todo')) == (True, None)
+    mock_db.rollback.assert_called_once()
+
+def test_rebuild_streams_partitions_and_renames(mocker, mock_redis):
+    rows = [mocker.Mock(id=i, **{'_asdict.return_value': {'id': i}}) for i in (1, 2, 3)]
+    session = mocker.Mock()
+    session.execute.return_value.partitions.return_value = [rows[:2], rows[2:]]
+    update_all_todos_cache(session)
+
+    session.execute.assert_called_once_with(
+        mocker.ANY, execution_options={'yield_per': REBUILD_BATCH_SIZE}
+    )
+    pipe = mock_redis.pipeline.return_value.__enter__.return_value
+    # One round trip per partition, then the swap
+    assert pipe.execute.call_count == 3
+    temp_key = pipe.hset.call_args.args[0]
+    assert temp_key != ALL_TODOS_KEY
+    pipe.rename.assert_called_once_with(temp_key, ALL_TODOS_KEY)
+
+def test_apply_changes_keeps_an_expiry_on_the_hash(mock_redis):
+    apply_todo_cache_changes({1: {'id': 1}, 2: None})
+    pipe = mock_redis.pipeline.return_value
+    pipe.hset.assert_called_once()
+    pipe.hdel.assert_called_once_with(ALL_TODOS_KEY, 2)
+    pipe.expire.assert_called_once_with(ALL_TODOS_KEY, ALL_TODOS_TTL, nx=True)
+
+def test_retry_recovers_from_transient_error(mocker):
+    sleep = mocker.patch('worker.time.sleep')
+    fn = mocker.Mock(side_effect=[redis.exceptions.ConnectionError('reset'), 'ok'])
+    assert _retry(fn, 'arg') == 'ok'
+    assert fn.call_count == 2
+    fn.assert_called_with('arg')
+    sleep.assert_called_once()
+
+def test_retry_gives_up_after_max_attempts(mocker):
+    mocker.patch('worker.time.sleep')
+    fn = mocker.Mock(side_effect=redis.exceptions.TimeoutError('slow'))
+    with pytest.raises(redis.exceptions.TimeoutError):
+        _retry(fn)
+    assert fn.call_count == RETRY_ATTEMPTS
+
+def test_retry_does_not_retry_permanent_error(mocker):
+    sleep = mocker.patch('worker.time.sleep')
+    fn = mocker.Mock(side_effect=ValueError('bad data'))
+    with pytest.raises(ValueError):
+        _retry(fn)
+    assert fn.call_count == 1
+    sleep.assert_not_called()
+
+def test_api_issued_id_round_trips(mock_db, mock_redis):
+    todo_id = api_todo_id()
+    assert todo_id >= 2 ** 31
+
+    success, change = process_notification(create_message(todo_id, title='Test Todo'))
+    assert success
+    assert change[0] == todo_id
+    mock_db.get.assert_called_with(Todo, todo_id)
+    assert mock_db.add.call_args.args[0].id == todo_id
+
+    process_notification({'Body': json.dumps({'todo_id': todo_id, 'action': 'todo_deleted'})})
+    # psycopg 3 casts binds to the column type, so the column must be BIGINT
+    compiled = mock_db.execute.call_args.args[0].compile(dialect=psycopg.dialect())
+    assert '::BIGINT' in str(compiled)
+    assert todo_id in compiled.params.values()
+
+def test_decode_message_fields():
+    msg = _MSG_DECODER.decode(json.dumps({
+        'todo_id': '42',
+        'action': 'todo_updated',
+        'title': 'Updated Todo',
+        'due_date': None,
+        'timestamp': '2024-01-01T00:00:00'
+    }))
+    # Numeric string ids are accepted and unknown keys are ignored
+    assert msg.todo_id == 42
+    assert msg.action == 'todo_updated'
+    # Only the fields present in the body are reported, including explicit nulls
+    assert _present_fields(msg) == {'title': 'Updated Todo', 'due_date': None}
+
+def test_decode_message_aliases():
+    msg = _MSG_DECODER.decode(json.dumps({
+        'todoId': 7,
+        'type': 'todo_created',
+        'title': 'Aliased Todo',
+        'priority': 'high'
+    }))
+    assert msg.todo_id_alt == 7
+    assert msg.action_alt == 'todo_created'
+    assert _present_fields(msg) == {'title': 'Aliased Todo', 'priority': 'high'}
+
+def test_decode_message_rejects_wrong_types():
+    with pytest.raises(msgspec.ValidationError):
+        _MSG_DECODER.decode(json.dumps({'todo_id': 'abc', 'action': 'todo_deleted'}))
+    with pytest.raises(msgspec.ValidationError):
+        _MSG_DECODER.decode(json.dumps({'todo_id': 1, 'action': 'todo_created', 'title': 5}))
+
+def test_decode_message_rejects_malformed_json():
+    with pytest.raises(msgspec.DecodeError):
+        _MSG_DECODER.decode(b'{"todo_id": 1,')
+
+def test_missing_todo_id_rejected_before_any_work(mock_db, mock_redis):
+    with pytest.raises(ValueError):
+        process_notification(create_message(None, title='Test Todo'))
+    mock_redis.exists.assert_not_called()
+    mock_db.get.assert_not_called()
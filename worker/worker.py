@@ -1,20 +1,21 @@
-import os
-import json
+import asyncio
+import random
 import time
-import boto3
+import uuid
+import msgspec
+import orjson
 import redis
-from datetime import datetime
-from dotenv import load_dotenv
+from typing import Optional, Union
 import sys
 
 from config import (
-    QUEUE_URL, DATABASE_URL, REDIS_HOST, REDIS_PORT,SQS_REGION
+    QUEUE_URL, REDIS_HOST, REDIS_PORT, REDIS_PASSWORD, RUN_MIGRATIONS
 )
-from models import Todo, Base
-from sqlalchemy import create_engine
-from sqlalchemy.orm import sessionmaker
+from clients import create_async_sqs_client
+from models import Todo, SessionLocal, init_db
+import sqlalchemy.exc
+from sqlalchemy import delete, select, update
 import logging
-from functools import wraps
 
 # Configure logging
 logging.basicConfig(
@@ -23,17 +24,20 @@ logging.basicConfig(
 )
 logger = logging.getLogger(__name__)
 
-load_dotenv()
-
 # Initialize Redis client
 logger.info(f"Initializing Redis client with host: {REDIS_HOST}, port: {REDIS_PORT}")
 
-redis_client = redis.Redis(
+# Bounded pool with keep-alive, shared by every cache writer (plain TCP, no SSL)
+pool = redis.BlockingConnectionPool(
     host=REDIS_HOST,
     port=REDIS_PORT,
-    password=os.getenv('REDIS_PASSWORD'),
-    ssl=False,  # Disable SSL
+    max_connections=16,
+    socket_keepalive=True,
+    socket_connect_timeout=2,
+    health_check_interval=30,
+    password=REDIS_PASSWORD
 )
+redis_client = redis.Redis(connection_pool=pool)
 
 # Test Redis connection
 try:
@@ -43,212 +47,429 @@ except Exception as e:
     logger.error(f"Failed to connect to Redis: {str(e)}")
     raise
 
-# Initialize SQS client
-sqs_config = {
-    'region_name': SQS_REGION,
-}
+# All todos are cached in a Redis hash of todo id -> encoded todo JSON and
+# kept current with per-todo updates instead of full rebuilds
+ALL_TODOS_KEY = 'all_todos_h'
+
+# Backstop for a lost incremental update: each full rebuild sets this expiry
+# and per-todo updates leave it alone, so a wrong hash lives at most this long
+ALL_TODOS_TTL = 300
 
-# Only add endpoint URL and credentials for local development
-if 'elasticmq' in QUEUE_URL:
-    sqs_config.update({
-        'endpoint_url': QUEUE_URL,
-        'aws_access_key_id': os.getenv('SQS_ACCESS_KEY'),
-        'aws_secret_access_key': os.getenv('SQS_SECRET_KEY')
-    })
+# How long a committed create is remembered for redelivery deduplication
+DEDUP_TTL = 3600
 
-sqs = boto3.client('sqs', **sqs_config)
+# SQS caps a single receive at 10 messages
+RECEIVE_BATCH_SIZE = 10
 
 def get_db_session():
-    engine = create_engine(DATABASE_URL)
-    Session = sessionmaker(bind=engine)
-    return Session()
-
-def init_db():
-    engine = create_engine(DATABASE_URL)
-    Base.metadata.create_all(engine)
-
-def retry_on_error(max_retries=3, delay=1):
-    """Decorator to retry operations on failure"""
-    def decorator(func):
-        @wraps(func)
-        def wrapper(*args, **kwargs):
-            for attempt in range(max_retries):
-                try:
-                    return func(*args, **kwargs)
-                except Exception as e:
-                    if attempt == max_retries - 1:
-                        raise e
-                    logger.warning(f"Attempt {attempt + 1} failed: {e}. Retrying...")
-                    time.sleep(delay)
-            return None
-        return wrapper
-    return decorator
+    # Sessions share the module-level engine's connection pool
+    return SessionLocal()
+
+# Errors worth retrying; anything else (bad data, constraint violations) is permanent
+TRANSIENT_ERRORS = (
+    ConnectionError,
+    redis.exceptions.ConnectionError,
+    redis.exceptions.TimeoutError,
+    sqlalchemy.exc.OperationalError
+)
+
+# Attempts and base backoff delay (seconds) for transient failures
+RETRY_ATTEMPTS = 3
+RETRY_DELAY = 1
+
+def _retry(fn, *args):
+    """Call fn(*args), retrying transient failures with exponential backoff"""
+    # The common case succeeds first time with a single try/except
+    try:
+        return fn(*args)
+    except TRANSIENT_ERRORS as e:
+        error = e
+    for attempt in range(1, RETRY_ATTEMPTS):
+        logger.warning(f"Attempt {attempt} failed: {error}. Retrying...")
+        time.sleep(RETRY_DELAY * (2 ** (attempt - 1)) + random.uniform(0, 0.1 * RETRY_DELAY))
+        try:
+            return fn(*args)
+        except TRANSIENT_ERRORS as e:
+            error = e
+    raise error
 
 def todo_to_dict(todo):
-    """Convert a Todo object to a dictionary with proper datetime formatting"""
+    """Convert a Todo object to a dictionary; orjson formats the datetimes"""
     return {
         'id': todo.id,
         'title': todo.title,
         'description': todo.description,
-        'due_date': todo.due_date.isoformat() if todo.due_date else None,
+        'due_date': todo.due_date,
         'priority': todo.priority,
         'status': todo.status,
-        'created_at': todo.created_at.isoformat() if todo.created_at else None,
-        'updated_at': todo.updated_at.isoformat() if todo.updated_at else None
+        'created_at': todo.created_at,
+        'updated_at': todo.updated_at
     }
 
-@retry_on_error(max_retries=3)
+# Rows fetched per round trip while rebuilding the all todos cache
+REBUILD_BATCH_SIZE = 1000
+
+_ALL_TODOS = select(
+    Todo.id, Todo.title, Todo.description, Todo.due_date,
+    Todo.priority, Todo.status, Todo.created_at, Todo.updated_at
+).order_by(Todo.id)
+
 def update_all_todos_cache(session):
-    """Update the all_todos cache with fresh data from database"""
+    """Rebuild the all todos cache with fresh data from database"""
     try:
-        invalidate_all_todos_cache()
-        # Get fresh data from database
-        todos = session.query(Todo).all()
-        todos_list = [todo_to_dict(todo) for todo in todos]
-
-        # Update cache with new data
-        cache_data = {
-            'todos': todos_list,
-            '_cached_at': datetime.utcnow().isoformat()
-        }
-        redis_client.set('all_todos', json.dumps(cache_data))
-        logger.info("Updated all_todos cache with fresh data")
+        # Stream plain rows through a server-side cursor instead of
+        # hydrating every todo as an ORM object
+        result = session.execute(
+            _ALL_TODOS,
+            execution_options={'yield_per': REBUILD_BATCH_SIZE}
+        )
+
+        # Build the new hash under a temporary key and swap it in with
+        # RENAME, so readers see either the old hash or the complete new one
+        temp_key = f'{ALL_TODOS_KEY}:rebuild:{uuid.uuid4().hex}'
+        with redis_client.pipeline(transaction=False) as pipe:
+            count = 0
+            # One round trip per partition keeps a single batch in memory;
+            # the expiry also cleans up a rebuild abandoned halfway
+            for rows in result.partitions():
+                pipe.hset(temp_key, mapping={
+                    row.id: orjson.dumps(row._asdict()) for row in rows
+                })
+                pipe.expire(temp_key, ALL_TODOS_TTL)
+                pipe.execute()
+                count += len(rows)
+            if count:
+                # RENAME carries the expiry over to the live key
+                pipe.rename(temp_key, ALL_TODOS_KEY)
+            else:
+                pipe.delete(ALL_TODOS_KEY)
+            pipe.execute()
+        logger.info("Rebuilt all todos cache with fresh data")
     except Exception as e:
-        logger.error(f"Error updating all_todos cache: {e}")
+        logger.error(f"Error updating all todos cache: {e}")
+        raise
+
+def apply_todo_cache_changes(changes):
+    """Apply per-todo changes to the all todos cache in one round trip.
+
+    changes maps a todo id to its new dict, or to None if it was deleted.
+    """
+    try:
+        pipe = redis_client.pipeline(transaction=False)
+        for todo_id, todo in changes.items():
+            if todo is None:
+                pipe.hdel(ALL_TODOS_KEY, todo_id)
+            else:
+                pipe.hset(ALL_TODOS_KEY, todo_id, orjson.dumps(todo))
+        # If the hash expired after the caller's EXISTS check, HSET just
+        # recreated it with only this batch; give it the TTL so it is rebuilt
+        pipe.expire(ALL_TODOS_KEY, ALL_TODOS_TTL, nx=True)
+        pipe.execute()
+        logger.info(f"Applied {len(changes)} changes to all todos cache")
+    except Exception as e:
+        logger.error(f"Error applying changes to all todos cache: {e}")
         raise
 
-@retry_on_error(max_retries=3)
 def invalidate_all_todos_cache():
-    """Invalidate the all_todos cache"""
+    """Invalidate the all todos cache"""
     try:
-        redis_client.delete('all_todos')
-        logger.info("Invalidated all_todos cache")
+        redis_client.delete(ALL_TODOS_KEY)
+        logger.info("Invalidated all todos cache")
     except Exception as e:
-        logger.error(f"Error invalidating all_todos cache: {e}")
+        logger.error(f"Error invalidating all todos cache: {e}")
         raise
 
+# Todo columns a notification may carry
+TODO_FIELDS = ('title', 'description', 'status', 'priority', 'due_date')
+
+class TodoMsg(msgspec.Struct):
+    """SQS notification body; todo fields left UNSET were not in the message"""
+    todo_id: Optional[int] = None
+    action: Optional[str] = None
+    # Alternative key names some producers use
+    todo_id_alt: Optional[int] = msgspec.field(default=None, name='todoId')
+    action_alt: Optional[str] = msgspec.field(default=None, name='type')
+    title: Union[Optional[str], msgspec.UnsetType] = msgspec.UNSET
+    description: Union[Optional[str], msgspec.UnsetType] = msgspec.UNSET
+    status: Union[Optional[str], msgspec.UnsetType] = msgspec.UNSET
+    priority: Union[Optional[str], msgspec.UnsetType] = msgspec.UNSET
+    due_date: Union[Optional[str], msgspec.UnsetType] = msgspec.UNSET
+
+# Parses and validates a message body in one pass; strict=False accepts
+# ids sent as numeric strings
+_MSG_DECODER = msgspec.json.Decoder(TodoMsg, strict=False)
+
+def _present_fields(msg):
+    """Todo fields that were present in the message"""
+    return {
+        key: value for key in TODO_FIELDS
+        if (value := getattr(msg, key)) is not msgspec.UNSET
+    }
+
+def _mark_created(dedup_key):
+    try:
+        redis_client.set(dedup_key, 1, ex=DEDUP_TTL)
+    except Exception as e:
+        # The todo is committed; a redelivery is still caught by the database check
+        logger.warning(f"Error marking create as processed: {e}")
+
+def _handle_create(db, todo_id, msg):
+    logger.debug('Creating todo with ID: %s', todo_id)
+    # Redeliveries of a create already handled usually stop at this Redis
+    # round trip. The key is only written once the todo is committed, so a
+    # crash before the commit leaves the redelivery to be processed again
+    dedup_key = f'dedup:todo_created:{todo_id}'
+    if redis_client.exists(dedup_key):
+        logger.debug('Todo with ID %s already processed, skipping creation', todo_id)
+        return True, None  # Processed successfully, nothing changed
+
+    # The todo is stored under the id the API issued, so the database has
+    # the final say on whether this create was already applied
+    existing_todo = db.get(Todo, todo_id)
+    if existing_todo:
+        logger.debug('Todo with ID %s already exists, skipping creation', todo_id)
+        _mark_created(dedup_key)
+        return True, None  # Processed successfully, nothing changed
+
+    # Extract todo data from the message, excluding metadata fields
+    todo_data = {
+        'title': None,
+        'description': None,
+        'status': 'pending',
+        'priority': 'medium',
+        'due_date': None
+    }
+    todo_data.update(_present_fields(msg))
+
+    # Ensure required fields are present
+    if not todo_data['title']:
+        logger.error('Title is required for todo creation: %s', todo_id)
+        return False, None
+
+    # Log the todo data before creation
+    if logger.isEnabledFor(logging.DEBUG):
+        logger.debug('Creating todo with data: %s', todo_data)
+
+    todo = Todo(id=todo_id, **todo_data)
+    db.add(todo)
+    try:
+        db.commit()
+    except sqlalchemy.exc.IntegrityError:
+        db.rollback()
+        if db.get(Todo, todo_id) is None:
+            raise
+        # A concurrent delivery of the same create committed first
+        logger.debug('Todo with ID %s already exists, skipping creation', todo_id)
+        _mark_created(dedup_key)
+        return True, None  # Processed successfully, nothing changed
+    db.refresh(todo)
+    _mark_created(dedup_key)
+    logger.debug('Successfully created todo: %s', todo_id)
+    return True, (todo.id, todo_to_dict(todo))
+
+def _handle_update(db, todo_id, msg):
+    logger.debug('Updating todo with ID: %s', todo_id)
+    # Only the fields present in the message are changed
+    values = _present_fields(msg)
+    if not values:
+        logger.debug('No fields to update for todo: %s', todo_id)
+        return True, None  # Processed successfully, nothing changed
+
+    # One UPDATE ... RETURNING instead of load, mutate, flush and refresh
+    row = db.execute(
+        update(Todo)
+        .where(Todo.id == todo_id)
+        .values(**values)
+        .returning(*Todo.__table__.c)
+    ).first()
+    db.commit()
+    if row is None:
+        return False, None  # No action was taken
+    logger.debug('Successfully updated todo: %s', todo_id)
+    return True, (row.id, row._asdict())
+
+def _handle_delete(db, todo_id, msg):
+    logger.debug('Deleting todo with ID: %s', todo_id)
+    db.execute(delete(Todo).where(Todo.id == todo_id))
+    db.commit()
+    logger.debug('Successfully deleted todo: %s', todo_id)
+    return True, (todo_id, None)
+
+HANDLERS = {
+    'todo_created': _handle_create,
+    'todo_updated': _handle_update,
+    'todo_deleted': _handle_delete
+}
+
 def process_notification(message):
+    """Apply one notification to the database.
+
+    Returns a (success, change) tuple. change is None when nothing changed,
+    otherwise (todo_id, todo dict or None if deleted) for the caller to apply
+    to the all todos cache once per received batch. Raises ValueError for an
+    unknown action or a missing todo id, and msgspec.ValidationError for a
+    field of the wrong type.
+    """
     try:
-        logger.info('Processing notification: %s', message)
-        data = json.loads(message['Body'])
-        logger.info('Parsed message body: %s', data)
-
-        todo_id = data.get('todoId') or data.get('todo_id')
-        action = data.get('type') or data.get('action')
-
-        # Extract todo data from the message, excluding metadata fields
-        todo_data = {
-            'title': data.get('title'),
-            'description': data.get('description'),
-            'status': data.get('status', 'pending'),
-            'priority': data.get('priority', 'medium'),
-            'due_date': data.get('due_date')
-        }
-        logger.info('Extracted todo_data: %s', todo_data)
-
-        logger.info('Notification details - ID: %s, Action: %s, Data: %s',
-                   todo_id, action, todo_data)
+        # Message bodies are only formatted when debug logging is on
+        debug = logger.isEnabledFor(logging.DEBUG)
+        if debug:
+            logger.debug('Processing notification: %s', message)
+        msg = _MSG_DECODER.decode(message['Body'])
+        if debug:
+            logger.debug('Parsed message body: %s', msg)
+
+        todo_id = msg.todo_id_alt or msg.todo_id
+        action = msg.action_alt or msg.action
+        logger.debug('Notification details - ID: %s, Action: %s', todo_id, action)
+
+        handler = HANDLERS.get(action)
+        if handler is None:
+            raise ValueError(f"Unknown notification action: {action}")
+        if todo_id is None:
+            raise ValueError(f"Notification is missing a todo id: {action}")
 
         db = get_db_session()
         try:
-            if action == 'todo_created':
-                logger.info('Creating todo with ID: %s', todo_id)
-                # Check if todo already exists
-                existing_todo = db.query(Todo).filter(Todo.id == int(todo_id)).first()
-                if existing_todo:
-                    logger.info('Todo with ID %s already exists, skipping creation', todo_id)
-                    return True  # Return True to indicate successful processing
-
-                # Ensure required fields are present
-                if not todo_data.get('title'):
-                    logger.error('Title is required for todo creation. Available fields: %s', list(todo_data.keys()))
-                    return False
-
-                # Log the todo data before creation
-                logger.info('Creating todo with data: %s', todo_data)
-
-                todo = Todo(**todo_data)
-                db.add(todo)
-                db.commit()
-                db.refresh(todo)
-                update_all_todos_cache(db)  # Rebuild all todos cache
-                logger.info('Successfully created todo: %s', todo_id)
-                return True  # Return True to indicate successful processing
-
-            elif action == 'todo_updated':
-                logger.info('Updating todo with ID: %s', todo_id)
-                todo = db.query(Todo).filter(Todo.id == int(todo_id)).first()
-                if todo:
-                    for key, value in todo_data.items():
-                        setattr(todo, key, value)
-                    db.commit()
-                    db.refresh(todo)
-                    update_all_todos_cache(db)  # Rebuild all todos cache
-                    logger.info('Successfully updated todo: %s', todo_id)
-                    return True  # Return True to indicate successful processing
-
-            elif action == 'todo_deleted':
-                logger.info('Deleting todo with ID: %s', todo_id)
-                todo = db.query(Todo).filter(Todo.id == int(todo_id)).first()
-                if todo:
-                    db.delete(todo)
-                    db.commit()
-                update_all_todos_cache(db)
-                logger.info('Successfully deleted todo: %s', todo_id)
-                return True  # Return True to indicate successful processing
-
-            return False  # Return False if no action was taken
-
+            success, change = handler(db, todo_id, msg)
         finally:
             db.close()
+        if success:
+            logger.info('Processed %s %s', action, todo_id)
+        return success, change
 
     except Exception as e:
         logger.error('Error processing notification: %s - Error: %s',
                     message, str(e), exc_info=True)
         raise
 
-def main():
+def refresh_all_todos_cache():
+    """Rebuild the all todos cache using a fresh session"""
+    db = get_db_session()
+    try:
+        _retry(update_all_todos_cache, db)
+    except Exception as e:
+        logger.error(f"Error refreshing all todos cache: {e}")
+    finally:
+        db.close()
+
+def sync_all_todos_cache(changes):
+    """Bring the all todos cache up to date after a batch of changes"""
+    try:
+        if redis_client.exists(ALL_TODOS_KEY):
+            _retry(apply_todo_cache_changes, changes)
+        else:
+            # Never built, evicted or invalidated: applying only this batch
+            # would leave a partial list, so rebuild it instead
+            refresh_all_todos_cache()
+    except Exception as e:
+        logger.error(f"Error syncing all todos cache: {e}")
+        # Drop the cache so readers fall back to the database
+        try:
+            _retry(invalidate_all_todos_cache)
+        except Exception:
+            pass
+
+def process_batch(messages):
+    """Apply a received batch to the database and cache, returning the messages to delete"""
+    successful = []
+    changes = {}
+    for message in messages:
+        try:
+            # Process the message and check if it was successful
+            success, change = process_notification(message)
+            if success:
+                successful.append(message)
+            if change:
+                todo_id, todo = change
+                changes[todo_id] = todo
+        except Exception as e:
+            logger.error(f"Error processing message: {e}")
+            # Don't delete the message if processing failed
+            # It will be retried later
+
+    # Update the all todos cache once for the whole batch
+    if changes:
+        sync_all_todos_cache(changes)
+    return successful
+
+async def receive_batch(sqs):
+    """Long-poll the queue for the next batch of messages"""
+    # Receive messages from the queue with increased visibility timeout
+    response = await sqs.receive_message(
+        QueueUrl=QUEUE_URL,
+        MaxNumberOfMessages=RECEIVE_BATCH_SIZE,
+        WaitTimeSeconds=20,
+        VisibilityTimeout=60  # Increased from 30 to 60 seconds
+    )
+    if logger.isEnabledFor(logging.DEBUG):
+        logger.debug("SQS response: %s", response)
+    return response.get('Messages', [])
+
+async def delete_messages(sqs, messages):
+    """Delete processed messages from the queue in a single batch call"""
+    response = await sqs.delete_message_batch(
+        QueueUrl=QUEUE_URL,
+        Entries=[
+            {'Id': str(i), 'ReceiptHandle': message['ReceiptHandle']}
+            for i, message in enumerate(messages)
+        ]
+    )
+    for failed in response.get('Failed', []):
+        logger.error(f"Error deleting message from queue: {failed}")
+    logger.info(f"Successfully deleted {len(response.get('Successful', []))} messages from queue")
+
+async def handle_batch(sqs, messages):
+    if not messages:
+        logger.info("No messages in queue, waiting...")
+        return
+    # Database and Redis work stays synchronous, off the event loop
+    successful = await asyncio.to_thread(process_batch, messages)
+
+    # Only delete the messages that were processed successfully
+    if successful:
+        await delete_messages(sqs, successful)
+
+async def main():
     logger.info("Starting worker...")
 
-    # Initialize database
-    init_db()
+    # Initialize database; create_all already skips existing tables
+    if RUN_MIGRATIONS:
+        await asyncio.to_thread(init_db)
 
-    while True:
+    async with create_async_sqs_client() as sqs:
+        # Warm up the SQS connection so the first receive_message does not also
+        # pay for endpoint resolution and the TLS handshake
         try:
-            # Receive messages from the queue with increased visibility timeout
-            response = sqs.receive_message(
-                QueueUrl=QUEUE_URL,
-                MaxNumberOfMessages=1,
-                WaitTimeSeconds=20,
-                VisibilityTimeout=60  # Increased from 30 to 60 seconds
+            await sqs.list_queues()
+            logger.info("SQS connection warmed up")
+        except Exception as e:
+            logger.warning(f"SQS warm-up failed: {e}")
+
+        # Start from a cache that matches the database
+        await asyncio.to_thread(refresh_all_todos_cache)
+
+        messages: list = []
+        while True:
+            # Long-poll for the next batch while the current one is processed
+            results = await asyncio.gather(
+                receive_batch(sqs),
+                handle_batch(sqs, messages),
+                return_exceptions=True
             )
-            logger.info("SQS response: %s", response)
-
-            if 'Messages' in response:
-                for message in response['Messages']:
-                    try:
-                        # Process the message and check if it was successful
-                        if process_notification(message):
-                            # Only delete the message if processing was successful
-                            sqs.delete_message(
-                                QueueUrl=QUEUE_URL,
-                                ReceiptHandle=message['ReceiptHandle']
-                            )
-                            logger.info("Successfully deleted message from queue")
-                    except Exception as e:
-                        logger.error(f"Error processing message: {e}")
-                        # Don't delete the message if processing failed
-                        # It will be retried later
+            received, handled = results
+            if isinstance(handled, BaseException):
+                logger.error(f"Error handling batch: {handled}")
+            if isinstance(received, BaseException):
+                logger.error(f"Error in main loop: {received}")
+                messages = []
+                await asyncio.sleep(5)  # Wait before retrying
             else:
-                logger.info("No messages in queue, waiting...")
-
-        except Exception as e:
-            logger.error(f"Error in main loop: {e}")
-            time.sleep(5)  # Wait before retrying
+                messages = received
 
 if __name__ == '__main__':
     try:
-        main()
+        asyncio.run(main())
     except KeyboardInterrupt:
         logger.info("Worker stopped by user")
     except Exception as e: